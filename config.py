@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Database settings and connections shared by the verification scripts
+"""
+
+import os
+from contextlib import contextmanager
+from functools import lru_cache
+from types import MappingProxyType
+from urllib.parse import urlparse
+
+import pymysql
+
+try:
+    from dbutils.pooled_db import PooledDB
+except ImportError:
+    PooledDB = None
+
+def _parse_database_url():
+    """Build the pymysql connection settings from DATABASE_URL"""
+    database_url = os.environ.get('DATABASE_URL', '')
+    if not database_url:
+        print("ERROR: DATABASE_URL not found")
+        exit(1)
+    
+    parsed = urlparse(database_url)
+    return {
+        'host': parsed.hostname,
+        'port': parsed.port or 3306,
+        'user': parsed.username,
+        'password': parsed.password,
+        'database': parsed.path.lstrip('/').split('?')[0],
+        'ssl_ca': '/etc/ssl/certs/ca-certificates.crt',
+        'ssl_verify_cert': True
+    }
+
+# Parsed once per process; read-only so no caller can alter it for the others
+DB_CONFIG = MappingProxyType(_parse_database_url())
+
+@lru_cache(maxsize=1)
+def _pool():
+    return PooledDB(creator=pymysql, mincached=1, maxcached=4, autocommit=True, **DB_CONFIG)
+
+@lru_cache(maxsize=1)
+def _cached_connection():
+    return pymysql.connect(**DB_CONFIG, autocommit=True)
+
+@contextmanager
+def db_connection():
+    """Borrow a connection from the DBUtils pool, or reuse one cached connection without it"""
+    if PooledDB is None:
+        yield _cached_connection()
+        return
+    conn = _pool().connection()
+    try:
+        yield conn
+    finally:
+        # Returns the connection to the pool
+        conn.close()
@@ -3,51 +3,61 @@
 Comprehensive verification of all 417 participants - QR codes and data accuracy
 """
 
-import pandas as pd
-import pymysql
+import numpy as np
 import os
-import json
-from urllib.parse import urlparse
+import re
+import sys
 from pathlib import Path
 
-# Parse DATABASE_URL
-DATABASE_URL = os.environ.get('DATABASE_URL', '')
-if not DATABASE_URL:
-    print("ERROR: DATABASE_URL not found")
-    exit(1)
+from verify_lib import ALL_BADGES, buffered_stdout, get_participants_df, save_report
 
-# Parse the URL
-parsed = urlparse(DATABASE_URL)
-db_config = {
-    'host': parsed.hostname,
-    'port': parsed.port or 3306,
-    'user': parsed.username,
-    'password': parsed.password,
-    'database': parsed.path.lstrip('/').split('?')[0],
-    'ssl_ca': '/etc/ssl/certs/ca-certificates.crt',
-    'ssl_verify_cert': True
-}
+# Lookup table of valid hex characters, indexed by byte value
+_NIB = np.zeros(256, dtype=bool)
+_NIB[list(b'0123456789abcdefABCDEF')] = True
+_DASH_POS = [8, 13, 18, 23]
+_HEX_POS = [i for i in range(36) if i not in _DASH_POS]
 
-def load_database_participants():
-    """Load all participants from database"""
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-    cursor.execute("""
-        SELECT id, uuid, name, mobile, qrToken, emergencyContact, 
-               photoUri, bloodGroup, age 
-        FROM participants 
-        ORDER BY qrToken
-    """)
-    participants = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return participants
+def valid_uuids(uuids):
+    """Check UUID format (8-4-4-4-12 hex digits) for a whole column at once"""
+    u = uuids.astype('string').fillna('')
+    ok = (u.str.len() == 36).to_numpy(dtype=bool)
+    # One row of 36 bytes per UUID; wrong-length values become blank rows
+    raw = np.array(u.where(ok, '').str.encode('ascii', 'replace').tolist(), dtype='S36')
+    b = raw.view(np.uint8).reshape(len(raw), 36)
+    ok &= (b[:, _DASH_POS] == ord('-')).all(axis=1)
+    ok &= _NIB[b[:, _HEX_POS]].all(axis=1)
+    return ok
 
-def extract_badge_number(qr_token):
-    """Extract badge number from QR token like PALITANA_YATRA_123"""
-    if qr_token and 'PALITANA_YATRA_' in qr_token:
-        return int(qr_token.replace('PALITANA_YATRA_', ''))
-    return None
+def collect_failures(df, checks):
+    """Return (badge, name, messages) for rows failing any (mask, message) check
+
+    A message is either a string or a callable that builds the message column
+    from the failing rows only, so passing rows are never formatted.
+    """
+    import pandas as pd
+    
+    masks = pd.DataFrame({i: mask for i, (mask, _) in enumerate(checks)}, index=df.index)
+    masks = masks.fillna(False).astype(bool)
+    failed = masks.any(axis=1)
+    rows = df[failed]
+    messages = pd.DataFrame(
+        {i: message(rows) if callable(message) else message
+         for i, (_, message) in enumerate(checks)},
+        index=rows.index, dtype=object
+    ).where(masks[failed])
+    return [
+        (int(badge), None if pd.isna(name) else name, [m for m in row if not pd.isna(m)])
+        for badge, name, row in zip(rows['badge'], rows['name'], messages.to_numpy())
+    ]
+
+# Canonical QR token: no leading zeros, so it round-trips with the badge number.
+# A plain string because it is only used through Series.str.fullmatch.
+_QR_TOKEN_PATTERN = r'PALITANA_YATRA_[1-9]\d*'
+
+# QR code files are named "<badge>_<name>.png"
+_QR_FILE_BADGE = re.compile(r'(\d+)_')
+
+SAMPLE_BADGES = [*range(1, 6), *range(413, 418)]
 
 def verify_qr_code_files():
     """Verify QR code files exist for all participants"""
@@ -55,40 +65,37 @@ def verify_qr_code_files():
     if not qr_dir.exists():
         return None, "QR codes directory not found"
     
-    qr_files = list(qr_dir.glob('*.png'))
-    file_badges = []
-    for f in qr_files:
-        parts = f.name.split('_')
-        if parts and parts[0].isdigit():
-            file_badges.append(int(parts[0]))
+    with os.scandir(qr_dir) as entries:
+        file_badges = [
+            int(m.group(1)) for e in entries
+            if e.name.endswith('.png')
+            for m in (_QR_FILE_BADGE.match(e.name),) if m
+        ]
     
     return sorted(file_badges), None
 
 def main():
+    import pandas as pd
+    
     print("=" * 70)
     print("COMPREHENSIVE PARTICIPANT VERIFICATION REPORT")
     print("=" * 70)
     
-    # Load participants from database
-    participants = load_database_participants()
+    # Load participants from database (shared with verify_final_data in one process)
+    participants = get_participants_df()
     print(f"\n📊 Total participants in database: {len(participants)}")
-    
-    # Create lookup by badge number
-    by_badge = {}
-    for p in participants:
-        badge = extract_badge_number(p['qrToken'])
-        if badge:
-            by_badge[badge] = p
+    with_badge = participants[(participants['badge'] > 0).fillna(False)]
+    with_badge = with_badge.drop_duplicates('badge', keep='last')
+    expected = with_badge[with_badge['badge'].isin(ALL_BADGES)].sort_values('badge')
     
     # Verify all 417 badge numbers exist
     print("\n" + "-" * 70)
     print("1. BADGE NUMBER VERIFICATION")
     print("-" * 70)
     
-    missing_badges = []
-    for i in range(1, 418):
-        if i not in by_badge:
-            missing_badges.append(i)
+    missing_badges = np.setdiff1d(
+        ALL_BADGES, with_badge['badge'].to_numpy(dtype='int64')
+    ).tolist()
     
     if missing_badges:
         print(f"❌ Missing badge numbers: {missing_badges}")
@@ -101,10 +108,11 @@ def main():
     print("-" * 70)
     
     file_badges, error = verify_qr_code_files()
+    missing_files = []
     if error:
         print(f"⚠️  {error}")
     else:
-        missing_files = [i for i in range(1, 418) if i not in file_badges]
+        missing_files = np.setdiff1d(ALL_BADGES, file_badges).tolist()
         if missing_files:
             print(f"❌ Missing QR code files for badges: {missing_files}")
         else:
@@ -115,22 +123,12 @@ def main():
     print("3. DATA COMPLETENESS VERIFICATION")
     print("-" * 70)
     
-    incomplete = []
-    for badge in range(1, 418):
-        if badge not in by_badge:
-            continue
-        p = by_badge[badge]
-        missing_fields = []
-        
-        if not p['name'] or str(p['name']).strip() == '':
-            missing_fields.append('name')
-        if not p['uuid']:
-            missing_fields.append('uuid')
-        if not p['qrToken']:
-            missing_fields.append('qrToken')
-        
-        if missing_fields:
-            incomplete.append((badge, p['name'], missing_fields))
+    name = expected['name'].astype('string')
+    incomplete = collect_failures(expected, [
+        (name.isna() | (name.str.strip() == ''), 'name'),
+        (expected['uuid'].isna() | (expected['uuid'] == ''), 'uuid'),
+        (expected['qrToken'].isna() | (expected['qrToken'] == ''), 'qrToken'),
+    ])
     
     if incomplete:
         print("❌ Participants with missing critical data:")
@@ -144,34 +142,24 @@ def main():
     print("4. DATA VALIDITY VERIFICATION")
     print("-" * 70)
     
-    invalid = []
-    for badge in range(1, 418):
-        if badge not in by_badge:
-            continue
-        p = by_badge[badge]
-        issues = []
-        
+    expected = expected.assign(
+        age_num=np.trunc(pd.to_numeric(expected['age'], errors='coerce').astype('Float64'))
+    )
+    age_num = expected['age_num']
+    invalid = collect_failures(expected, [
         # Check UUID format
-        uuid = p['uuid']
-        if not uuid or len(uuid) != 36 or uuid.count('-') != 4:
-            issues.append(f"invalid UUID: {uuid}")
-        
+        (~valid_uuids(expected['uuid']),
+         lambda rows: 'invalid UUID: ' + rows['uuid'].astype(object).fillna('None').astype(str)),
         # Check QR token format
-        expected_token = f"PALITANA_YATRA_{badge}"
-        if p['qrToken'] != expected_token:
-            issues.append(f"wrong qrToken: expected {expected_token}, got {p['qrToken']}")
-        
+        (~expected['qrToken'].astype('string').str.fullmatch(_QR_TOKEN_PATTERN),
+         lambda rows: 'wrong qrToken: expected PALITANA_YATRA_' + rows['badge'].astype('string')
+                      + ', got ' + rows['qrToken'].astype('string')),
         # Check age if present
-        if p['age'] is not None:
-            try:
-                age = int(p['age'])
-                if age < 1 or age > 120:
-                    issues.append(f"invalid age: {age}")
-            except:
-                issues.append(f"non-numeric age: {p['age']}")
-        
-        if issues:
-            invalid.append((badge, p['name'], issues))
+        (age_num.notna() & ((age_num < 1) | (age_num > 120)),
+         lambda rows: 'invalid age: ' + rows['age_num'].astype('Int64').astype('string')),
+        (expected['age'].notna() & age_num.isna(),
+         lambda rows: 'non-numeric age: ' + rows['age'].astype('string')),
+    ])
     
     if invalid:
         print("❌ Participants with invalid data:")
@@ -185,31 +173,32 @@ def main():
     print("5. SAMPLE PARTICIPANT DETAILS (First 5 and Last 5)")
     print("-" * 70)
     
-    print("\n📋 First 5 Participants:")
-    for badge in range(1, 6):
-        if badge in by_badge:
-            p = by_badge[badge]
-            print(f"\n   Badge #{badge}: {p['name']}")
-            print(f"      UUID: {p['uuid'][:8]}...{p['uuid'][-4:]}")
-            print(f"      QR Token: {p['qrToken']}")
-            print(f"      Mobile: {p['mobile'] or 'N/A'}")
-            print(f"      Emergency: {p['emergencyContact'] or 'N/A'}")
-            print(f"      Blood Group: {p['bloodGroup'] or 'N/A'}")
-            print(f"      Age: {p['age'] or 'N/A'}")
-            print(f"      Photo: {'✓' if p['photoUri'] else 'N/A'}")
+    sample = with_badge[with_badge['badge'].isin(SAMPLE_BADGES)].sort_values('badge')
+    uuid_short = sample['uuid'].str[:8] + '...' + sample['uuid'].str[-4:]
+    sample = sample.astype(object).where(sample.notna(), None)
+    sample['uuid_short'] = uuid_short.astype(object)
+    
+    sample_cols = ['badge', 'name', 'uuid_short', 'qrToken', 'mobile',
+                   'emergencyContact', 'bloodGroup', 'age', 'photoUri']
+    
+    def describe(rows):
+        return ''.join(
+            f"\n   Badge #{badge}: {name}\n"
+            f"      UUID: {uuid_short}\n"
+            f"      QR Token: {qr_token}\n"
+            f"      Mobile: {mobile or 'N/A'}\n"
+            f"      Emergency: {emergency or 'N/A'}\n"
+            f"      Blood Group: {blood or 'N/A'}\n"
+            f"      Age: {age or 'N/A'}\n"
+            f"      Photo: {'✓' if photo else 'N/A'}\n"
+            for badge, name, uuid_short, qr_token, mobile, emergency, blood, age, photo
+            in rows[sample_cols].itertuples(index=False, name=None)
+        )
     
-    print("\n📋 Last 5 Participants:")
-    for badge in range(413, 418):
-        if badge in by_badge:
-            p = by_badge[badge]
-            print(f"\n   Badge #{badge}: {p['name']}")
-            print(f"      UUID: {p['uuid'][:8]}...{p['uuid'][-4:]}")
-            print(f"      QR Token: {p['qrToken']}")
-            print(f"      Mobile: {p['mobile'] or 'N/A'}")
-            print(f"      Emergency: {p['emergencyContact'] or 'N/A'}")
-            print(f"      Blood Group: {p['bloodGroup'] or 'N/A'}")
-            print(f"      Age: {p['age'] or 'N/A'}")
-            print(f"      Photo: {'✓' if p['photoUri'] else 'N/A'}")
+    sys.stdout.write(
+        "\n📋 First 5 Participants:\n" + describe(sample[sample['badge'] <= 5])
+        + "\n📋 Last 5 Participants:\n" + describe(sample[sample['badge'] >= 413])
+    )
     
     # Summary
     print("\n" + "=" * 70)
@@ -224,7 +213,7 @@ def main():
     else:
         print("✅ Badge Numbers: All 417 present")
     
-    if file_badges and len([i for i in range(1, 418) if i not in file_badges]) == 0:
+    if file_badges and not missing_files:
         print("✅ QR Code Files: All 417 present")
     elif file_badges:
         print(f"❌ QR Code Files: Some missing")
@@ -258,10 +247,10 @@ def main():
         'all_passed': all_passed
     }
     
-    with open('participant_verification_report.json', 'w') as f:
-        json.dump(report, f, indent=2)
+    save_report('participant_verification_report.json', report)
     
     print(f"\nDetailed report saved to: participant_verification_report.json")
 
 if __name__ == '__main__':
-    main()
+    with buffered_stdout():
+        main()
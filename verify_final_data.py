@@ -3,89 +3,38 @@
 Verify all participant information in database against Final Data sheet from IDCardData_2.xlsx
 """
 
+import numpy as np
 import pandas as pd
-import pymysql
-import os
-import json
-from urllib.parse import urlparse
 
-# Parse DATABASE_URL
-DATABASE_URL = os.environ.get('DATABASE_URL', '')
-if not DATABASE_URL:
-    print("ERROR: DATABASE_URL not found")
-    exit(1)
+from verify_lib import buffered_stdout, get_excel_df, get_participants_df, save_report
 
-# Parse the URL
-parsed = urlparse(DATABASE_URL)
-db_config = {
-    'host': parsed.hostname,
-    'port': parsed.port or 3306,
-    'user': parsed.username,
-    'password': parsed.password,
-    'database': parsed.path.lstrip('/').split('?')[0],
-    'ssl_ca': '/etc/ssl/certs/ca-certificates.crt',
-    'ssl_verify_cert': True
-}
+def normalize_phone_series(phones):
+    """Normalize a column of phone numbers for comparison (last 10 digits, no +91)"""
+    return (phones.astype('string')
+            .str.replace(r'[\s\-]', '', regex=True)
+            .str.removeprefix('+91')
+            .str.slice(-10)
+            .fillna(''))
 
-def load_excel_final_data():
-    """Load the Final Data sheet from Excel"""
-    excel_path = '/home/ubuntu/upload/IDCardData_2.xlsx'
-    df = pd.read_excel(excel_path, sheet_name='Final Data')
-    print(f"Loaded {len(df)} rows from Final Data sheet")
-    print(f"Columns: {list(df.columns)}")
-    return df
+def normalized_frame(badge, name, age, blood, phone, photo):
+    """Build one side of the comparison: display values plus normalized _*_n columns"""
+    name = name.astype('string').str.strip().fillna('')
+    blood = blood.astype('string').str.strip().fillna('')
+    return pd.DataFrame({
+        'badge': badge,
+        'name': name,
+        'blood': blood,
+        'photo': photo.astype('string').str.strip().fillna(''),
+        '_name_n': name.str.lower(),
+        '_age_n': age,
+        '_blood_n': blood.str.upper().str.replace(' ', '', regex=False),
+        '_phone_n': normalize_phone_series(phone),
+    })
 
-def load_database_participants():
-    """Load all participants from database"""
-    conn = pymysql.connect(**db_config)
-    cursor = conn.cursor(pymysql.cursors.DictCursor)
-    cursor.execute("""
-        SELECT id, uuid, name, mobile, qrToken, emergencyContact, 
-               photoUri, bloodGroup, age 
-        FROM participants 
-        ORDER BY qrToken
-    """)
-    participants = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    print(f"Loaded {len(participants)} participants from database")
-    return participants
-
-def extract_badge_number(qr_token):
-    """Extract badge number from QR token like PALITANA_YATRA_123"""
-    if qr_token and 'PALITANA_YATRA_' in qr_token:
-        return int(qr_token.replace('PALITANA_YATRA_', ''))
-    return None
-
-def normalize_name(name):
-    """Normalize name for comparison"""
-    if pd.isna(name) or name is None:
-        return ''
-    return str(name).strip().lower()
-
-def normalize_phone(phone):
-    """Normalize phone number for comparison"""
-    if pd.isna(phone) or phone is None:
-        return ''
-    return str(phone).strip().replace(' ', '').replace('-', '').replace('+91', '')[-10:]
-
-def normalize_blood_group(bg):
-    """Normalize blood group for comparison"""
-    if pd.isna(bg) or bg is None:
-        return ''
-    return str(bg).strip().upper().replace(' ', '')
-
-def compare_data(excel_df, db_participants):
+def compare_data(excel_df, db_df):
     """Compare Excel data with database and find discrepancies"""
-    discrepancies = []
-    matches = 0
-    
-    # Create a lookup by badge number for database
-    db_by_badge = {}
-    for p in db_participants:
-        badge = extract_badge_number(p['qrToken'])
-        if badge:
-            db_by_badge[badge] = p
+    # Key the database side by badge number
+    db_df = db_df[(db_df['badge'] > 0).fillna(False)].drop_duplicates('badge', keep='last')
     
     # Get column names from Excel
     excel_cols = list(excel_df.columns)
@@ -101,79 +50,86 @@ def compare_data(excel_df, db_participants):
     
     print(f"\nMapping: Name={name_col}, Badge={badge_col}, Age={age_col}, Blood={blood_col}, Emergency={emergency_col}")
     
-    for idx, row in excel_df.iterrows():
-        badge = int(row[badge_col]) if not pd.isna(row[badge_col]) else None
-        if badge is None:
-            continue
-            
-        excel_name = str(row[name_col]).strip() if not pd.isna(row[name_col]) else ''
+    # Normalize each side once, column-wise, before merging
+    excel = normalized_frame(
+        # Truncate like int() did, so a fractional badge cell can't abort the cast
+        badge=np.trunc(
+            pd.to_numeric(excel_df[badge_col], errors='coerce').astype('Float64')
+        ).astype('Int64'),
+        name=excel_df[name_col],
         # Handle age that might be in '16 years' format
-        excel_age_raw = row[age_col]
-        if pd.isna(excel_age_raw):
-            excel_age = None
-        else:
-            age_str = str(excel_age_raw).strip().lower().replace('years', '').replace('year', '').strip()
-            try:
-                excel_age = int(float(age_str))
-            except:
-                excel_age = None
-        excel_blood = str(row[blood_col]).strip() if not pd.isna(row[blood_col]) else ''
-        excel_emergency = normalize_phone(row[emergency_col])
-        excel_photo = str(row[photo_col]).strip() if photo_col and not pd.isna(row[photo_col]) else ''
-        
-        if badge not in db_by_badge:
-            discrepancies.append({
-                'badge': badge,
-                'issue': 'MISSING_IN_DB',
-                'excel_name': excel_name,
-                'details': f'Badge #{badge} ({excel_name}) not found in database'
-            })
-            continue
-        
-        db_record = db_by_badge[badge]
-        db_name = str(db_record['name']).strip() if db_record['name'] else ''
-        db_age = db_record['age']
-        db_blood = str(db_record['bloodGroup']).strip() if db_record['bloodGroup'] else ''
-        db_emergency = normalize_phone(db_record['emergencyContact'])
-        db_photo = str(db_record['photoUri']).strip() if db_record['photoUri'] else ''
-        
-        issues = []
-        
-        # Compare name (case-insensitive)
-        if normalize_name(excel_name) != normalize_name(db_name):
-            issues.append(f"Name mismatch: Excel='{excel_name}' vs DB='{db_name}'")
-        
-        # Compare age
-        if excel_age is not None and db_age is not None:
-            if excel_age != db_age:
-                issues.append(f"Age mismatch: Excel={excel_age} vs DB={db_age}")
-        elif excel_age is not None and db_age is None:
-            issues.append(f"Age missing in DB: Excel={excel_age}")
-        
-        # Compare blood group
-        if normalize_blood_group(excel_blood) != normalize_blood_group(db_blood):
-            if excel_blood:  # Only report if Excel has a value
-                issues.append(f"Blood group mismatch: Excel='{excel_blood}' vs DB='{db_blood}'")
-        
-        # Compare emergency contact
-        if excel_emergency != db_emergency:
-            if excel_emergency:  # Only report if Excel has a value
-                issues.append(f"Emergency contact mismatch: Excel='{excel_emergency}' vs DB='{db_emergency}'")
-        
-        # Compare photo URI
-        if excel_photo and not db_photo:
-            issues.append(f"Photo missing in DB: Excel has photo link")
-        
-        if issues:
-            discrepancies.append({
-                'badge': badge,
-                'issue': 'DATA_MISMATCH',
-                'excel_name': excel_name,
-                'db_name': db_name,
-                'details': '; '.join(issues)
-            })
-        else:
-            matches += 1
+        age=pd.to_numeric(
+            excel_df[age_col].astype('string').str.extract(r'(\d+)')[0], errors='coerce'
+        ).astype('Int64'),
+        blood=excel_df[blood_col],
+        phone=excel_df[emergency_col],
+        photo=excel_df[photo_col] if photo_col else pd.Series(pd.NA, index=excel_df.index),
+    )
+    excel = excel[excel['badge'].notna()]
+    
+    db = normalized_frame(
+        badge=db_df['badge'],
+        name=db_df['name'],
+        age=pd.to_numeric(db_df['age'], errors='coerce').astype('Int64'),
+        blood=db_df['bloodGroup'],
+        phone=db_df['emergencyContact'],
+        photo=db_df['photoUri'],
+    )
+    
+    merged = excel.merge(db, on='badge', how='left', suffixes=('_excel', '_db'), indicator=True)
+    missing = merged['_merge'] == 'left_only'
+    found = ~missing
+    
+    # Column-wise mismatch masks; only rows failing one of them get formatted
+    m = merged
+    masks = pd.DataFrame({
+        'name': m['_name_n_excel'] != m['_name_n_db'],
+        'age': m['_age_n_excel'].notna() & m['_age_n_db'].notna()
+               & (m['_age_n_excel'] != m['_age_n_db']),
+        'age_missing': m['_age_n_excel'].notna() & m['_age_n_db'].isna(),
+        'blood': (m['_blood_n_excel'] != '') & (m['_blood_n_excel'] != m['_blood_n_db']),
+        'phone': (m['_phone_n_excel'] != '') & (m['_phone_n_excel'] != m['_phone_n_db']),
+        'photo': (m['photo_excel'] != '') & (m['photo_db'] == ''),
+    }).fillna(False).astype(bool)
+    masks = masks[found]
+    any_bad = masks.any(axis=1)
+    
+    bad = merged.loc[any_bad.index[any_bad]]
+    masks = masks[any_bad]
+    messages = {
+        'name': "Name mismatch: Excel='" + bad['name_excel'] + "' vs DB='" + bad['name_db'] + "'",
+        'age': "Age mismatch: Excel=" + bad['_age_n_excel'].astype('string')
+               + " vs DB=" + bad['_age_n_db'].astype('string'),
+        'age_missing': "Age missing in DB: Excel=" + bad['_age_n_excel'].astype('string'),
+        'blood': "Blood group mismatch: Excel='" + bad['blood_excel']
+                 + "' vs DB='" + bad['blood_db'] + "'",
+        'phone': "Emergency contact mismatch: Excel='" + bad['_phone_n_excel']
+                 + "' vs DB='" + bad['_phone_n_db'] + "'",
+        'photo': "Photo missing in DB: Excel has photo link",
+    }
+    details = pd.Series('', index=bad.index, dtype='string')
+    for check, message in messages.items():
+        details = details.mask(masks[check], details + '; ' + message)
+    bad = bad.assign(issue='DATA_MISMATCH', details=details.str.removeprefix('; '))
+    
+    absent = merged[missing]
+    absent = absent.assign(
+        issue='MISSING_IN_DB',
+        details='Badge #' + absent['badge'].astype('string') + ' ('
+                + absent['name_excel'] + ') not found in database',
+    )
+    
+    # Report in Excel row order, as before
+    report = pd.concat([bad, absent]).sort_index().rename(
+        columns={'name_excel': 'excel_name', 'name_db': 'db_name'}
+    )
+    discrepancies = report[
+        ['badge', 'issue', 'excel_name', 'db_name', 'details']
+    ].astype(object).to_dict('records')
+    for d in discrepancies:
+        if d['issue'] == 'MISSING_IN_DB':
+            del d['db_name']
+    matches = int((~any_bad).sum())
     
     return discrepancies, matches
 
@@ -183,11 +139,14 @@ def main():
     print("=" * 60)
     
     # Load data
-    excel_df = load_excel_final_data()
-    db_participants = load_database_participants()
+    excel_df = get_excel_df()
+    print(f"Loaded {len(excel_df)} rows from Final Data sheet")
+    print(f"Columns: {list(excel_df.columns)}")
+    db_df = get_participants_df()
+    print(f"Loaded {len(db_df)} participants from database")
     
     # Compare
-    discrepancies, matches = compare_data(excel_df, db_participants)
+    discrepancies, matches = compare_data(excel_df, db_df)
     
     print("\n" + "=" * 60)
     print("VERIFICATION RESULTS")
@@ -207,14 +166,13 @@ def main():
     # Save report to JSON
     report = {
         'total_excel_records': len(excel_df),
-        'total_db_records': len(db_participants),
+        'total_db_records': len(db_df),
         'matches': matches,
         'discrepancies_count': len(discrepancies),
         'discrepancies': discrepancies
     }
     
-    with open('/home/ubuntu/palirana_yatra/verification_report.json', 'w') as f:
-        json.dump(report, f, indent=2)
+    save_report('/home/ubuntu/palirana_yatra/verification_report.json', report)
     
     print("\n" + "=" * 60)
     print(f"Report saved to verification_report.json")
@@ -223,4 +181,5 @@ def main():
     return discrepancies
 
 if __name__ == '__main__':
-    main()
+    with buffered_stdout():
+        main()
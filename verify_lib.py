@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Shared loaders and helpers for the participant verification scripts.
+
+The participants table and the Excel sheet are cached per process, so
+running both scripts from one interpreter loads each of them only once:
+
+    python -c "import verify_all_participants as a, verify_final_data as b; a.main(); b.main()"
+"""
+
+import numpy as np
+import importlib.util
+import io
+import os
+import sys
+import json
+from contextlib import contextmanager, redirect_stdout
+from functools import lru_cache
+from pathlib import Path
+
+from config import db_connection
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pandas (and pyarrow through it) is imported lazily by the loaders: it
+# dominates interpreter startup and isn't needed just to import the scripts
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+EXCEL_PATH = Path('/home/ubuntu/upload/IDCardData_2.xlsx')
+EXCEL_CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'qrtracking'
+
+# Badge numbers every participant list is checked against
+ALL_BADGES = np.arange(1, 418)
+
+def query_df(sql, args=None):
+    """Run a query and return the rows as a DataFrame, with a badge column if qrToken is selected"""
+    import pandas as pd
+    
+    with db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(sql, args)
+        cols = [c[0] for c in cursor.description]
+        rows = cursor.fetchall()
+    # Arrow-backed columns when pyarrow is available: contiguous buffers and
+    # Arrow compute kernels for the .str operations downstream
+    df = pd.DataFrame(rows, columns=cols).convert_dtypes(
+        dtype_backend='pyarrow' if HAVE_PYARROW else 'numpy_nullable'
+    )
+    if 'qrToken' in df:
+        # Badge number from QR token like PALITANA_YATRA_123
+        df['badge'] = pd.to_numeric(
+            df['qrToken'].astype('string').str.removeprefix('PALITANA_YATRA_'), errors='coerce'
+        ).astype('Int64')
+    return df
+
+@lru_cache(maxsize=1)
+def _load_participants():
+    return query_df("""
+        SELECT id, uuid, name, mobile, qrToken, emergencyContact,
+               photoUri, bloodGroup, age
+        FROM participants
+    """)
+
+def get_participants_df():
+    """Load all participants from database as a DataFrame with a badge column"""
+    return _load_participants().copy()
+
+@lru_cache(maxsize=1)
+def _load_excel():
+    import pandas as pd
+    
+    st = EXCEL_PATH.stat()
+    cache = EXCEL_CACHE_DIR / f'idcard_{st.st_mtime_ns}_{st.st_size}.parquet'
+    if cache.exists():
+        return pd.read_parquet(cache)
+    df = pd.read_excel(EXCEL_PATH, sheet_name='Final Data', engine='openpyxl')
+    # The cache is best-effort: without pyarrow, or with mixed-type columns
+    # parquet can't store, fall back to re-reading the workbook next time
+    tmp = cache.with_suffix('.tmp')
+    try:
+        # The sheet holds participant PII, so keep the copy owner-only
+        EXCEL_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'wb') as f:
+            df.to_parquet(f, compression='zstd')
+        tmp.replace(cache)
+    except (ImportError, ValueError, TypeError, OSError):
+        tmp.unlink(missing_ok=True)
+        return df
+    # Drop copies of older versions of the workbook
+    for stale in EXCEL_CACHE_DIR.glob('idcard_*.parquet'):
+        if stale != cache:
+            stale.unlink(missing_ok=True)
+    return df
+
+def get_excel_df():
+    """Load the Final Data sheet from Excel, via a parquet cache keyed by file mtime/size"""
+    return _load_excel().copy()
+
+@contextmanager
+def buffered_stdout():
+    """Collect everything printed inside the block and write it to stdout once"""
+    buf = io.StringIO()
+    try:
+        with redirect_stdout(buf):
+            yield
+    finally:
+        sys.stdout.write(buf.getvalue())
+        sys.stdout.flush()
+
+def save_report(path, report):
+    """Write the JSON report, using orjson when it is installed"""
+    if orjson is not None:
+        Path(path).write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)